@@ -9,94 +9,203 @@ import numpy as np
 import tkinter as tk
 from tkinter import ttk
 import threading
+import queue
 import time
 from datetime import datetime
 import math
+import logging
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; run the posture math as plain Python
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+
+
+@njit(cache=True, fastmath=True)
+def _angle(ax, ay, bx, by, cx, cy):
+    """Angle at b between points a and c, in degrees (0-180)"""
+    v1x = ax - bx
+    v1y = ay - by
+    v2x = cx - bx
+    v2y = cy - by
+    ang = math.degrees(math.atan2(v1x * v2y - v1y * v2x, v1x * v2x + v1y * v2y))
+    return ang if ang >= 0 else -ang
+
+
+@njit(cache=True, fastmath=True)
+def _posture_from_xy(buf):
+    """Shoulder slope, neck angle and forward-head flag from the
+    (6, 2) shoulder/ear/hip buffer filled by check_posture"""
+    lsx, lsy = buf[0, 0], buf[0, 1]
+    rsx, rsy = buf[1, 0], buf[1, 1]
+    lex, ley = buf[2, 0], buf[2, 1]
+    rex, rey = buf[3, 0], buf[3, 1]
+    lhx, lhy = buf[4, 0], buf[4, 1]
+    rhx, rhy = buf[5, 0], buf[5, 1]
+    
+    # Shoulder slope: angle of the shoulder line from horizontal. Shoulders
+    # never tip past vertical while sitting, so asin of the normalized rise
+    # is enough (clamped against rounding pushing it above 1)
+    dx = rsx - lsx
+    dy = rsy - lsy
+    shoulder_slope = math.degrees(math.asin(min(abs(dy) / (math.sqrt(dx * dx + dy * dy) + 1e-9), 1.0)))
+    
+    # Neck angle (hip -> shoulder -> ear)
+    shx = 0.5 * (lsx + rsx)
+    shy = 0.5 * (lsy + rsy)
+    earx = 0.5 * (lex + rex)
+    eary = 0.5 * (ley + rey)
+    hipx = 0.5 * (lhx + rhx)
+    hipy = 0.5 * (lhy + rhy)
+    neck_angle = _angle(hipx, hipy, shx, shy, earx, eary)
+    
+    # Forward head posture
+    head_forward = earx > shx + 0.05
+    
+    return shoulder_slope, neck_angle, head_forward
+
+
+def _landmarks_to_array(pose_landmarks, out):
+    """Copy x, y and visibility of every pose landmark into out (N, 3)"""
+    for i, lm in enumerate(pose_landmarks.landmark):
+        out[i, 0] = lm.x
+        out[i, 1] = lm.y
+        out[i, 2] = lm.visibility
+
 
 class PostureGuardian:
     def __init__(self):
         # MediaPipe setup
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
+        # Lite model is enough for shoulders/ears/hips; video mode tracks
+        # landmarks between frames instead of re-detecting every time
+        pose_options = dict(
+            static_image_mode=False,
+            smooth_landmarks=True,
+            enable_segmentation=False,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
         )
-        self.mp_drawing = mp.solutions.drawing_utils
+        try:
+            # mediapipe downloads the lite model into its package folder on first use
+            self.pose = self.mp_pose.Pose(model_complexity=0, **pose_options)
+        except OSError as e:
+            logger.warning("Lite pose model unavailable (%s); using the bundled full model", e)
+            self.pose = self.mp_pose.Pose(model_complexity=1, **pose_options)
+        
+        # Landmark indices and connections resolved once, not per frame
+        # (connections as an (N, 2) index array so the skeleton is one draw call)
+        self._conn = np.array(sorted(self.mp_pose.POSE_CONNECTIONS), dtype=np.int32)
+        PL = self.mp_pose.PoseLandmark
+        self._idx = np.array([
+            PL.LEFT_SHOULDER.value, PL.RIGHT_SHOULDER.value,
+            PL.LEFT_EAR.value, PL.RIGHT_EAR.value,
+            PL.LEFT_HIP.value, PL.RIGHT_HIP.value
+        ], dtype=np.intp)
+        # All landmarks as (x, y, visibility), filled once per detection
+        self._all_lm = np.empty((len(PL), 3), dtype=np.float32)
+        self._lm_buf = np.empty((6, 2), dtype=np.float32)
+        # Compile the posture math now rather than on the first frame
+        _posture_from_xy(np.zeros((6, 2), dtype=np.float32))
         
         # State
-        self.good_posture = None
-        self.bad_posture_counter = 0
+        self.good_posture_vec = None  # calibrated [shoulder_slope, neck_angle]
+        self.good_head_forward = False
+        self.ema_alpha = 0.3  # weight of the newest sample in the smoothed angles
+        self.eval_interval = 0.1  # seconds between posture decisions
+        self._ema = None
+        self._bad_ticks = 0
+        self._next_eval = 0.0
         self.sensitivity = 8  # degrees (more sensitive by default)
         self.alert_duration = 3  # seconds
+        self.infer_every = 2  # run pose detection on every Nth frame
         self.last_alert_time = 0
         self.monitoring = False
         self.calibrating = False
+        self.show_skeleton = True
         
-        # Camera
+        # Camera (frames are captured and analyzed on a background thread)
         self.cap = None
+        self._capture_thread = None
+        self._frame_q = queue.Queue(maxsize=1)
+        self._stop = threading.Event()
+        self._tick = 0
+        self._last_results = None
+        self._last_posture = None
+        
+        # Per-frame buffers, reused by the capture thread. The camera buffers
+        # are sized on the first frame; the preview is written straight into
+        # a PPM buffer that Tk can load.
+        self._cap_buf = None
+        self._flip_buf = None
+        self._rgb_buf = None
+        ppm_header = b'P6 480 360 255\n'
+        self._ppm_buf = bytearray(len(ppm_header) + 360 * 480 * 3)
+        self._ppm_buf[:len(ppm_header)] = ppm_header
+        self._preview_buf = np.frombuffer(
+            self._ppm_buf, dtype=np.uint8, offset=len(ppm_header)
+        ).reshape(360, 480, 3)
         
         # GUI
         self.root = None
         self.video_label = None
+        self.video_image = None
         self.status_label = None
+        self._status = None
         self.alert_window = None
+        self._alert_job = None
         
-    def calculate_angle(self, p1, p2, p3):
-        """Calculate angle between three points"""
-        radians = math.atan2(p3.y - p2.y, p3.x - p2.x) - \
-                  math.atan2(p1.y - p2.y, p1.x - p2.x)
-        angle = abs(radians * 180.0 / math.pi)
-        if angle > 180.0:
-            angle = 360 - angle
-        return angle
-    
     def check_posture(self, landmarks):
-        """Analyze posture from landmarks"""
+        """Analyze posture from the (x, y, visibility) landmark array"""
         try:
-            # Get key landmarks
-            left_shoulder = landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-            right_shoulder = landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-            left_ear = landmarks[self.mp_pose.PoseLandmark.LEFT_EAR.value]
-            right_ear = landmarks[self.mp_pose.PoseLandmark.RIGHT_EAR.value]
-            left_hip = landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value]
-            right_hip = landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP.value]
-            
-            # Calculate shoulder slope
-            shoulder_slope = abs(
-                math.atan2(right_shoulder.y - left_shoulder.y, 
-                          right_shoulder.x - left_shoulder.x) * 180 / math.pi
-            )
-            
-            # Calculate neck angle
-            avg_ear = type('obj', (object,), {
-                'x': (left_ear.x + right_ear.x) / 2,
-                'y': (left_ear.y + right_ear.y) / 2
-            })()
-            avg_shoulder = type('obj', (object,), {
-                'x': (left_shoulder.x + right_shoulder.x) / 2,
-                'y': (left_shoulder.y + right_shoulder.y) / 2
-            })()
-            avg_hip = type('obj', (object,), {
-                'x': (left_hip.x + right_hip.x) / 2,
-                'y': (left_hip.y + right_hip.y) / 2
-            })()
-            
-            neck_angle = self.calculate_angle(avg_hip, avg_shoulder, avg_ear)
+            # Gather key landmarks: shoulders, ears, hips (left, right)
+            buf = np.take(landmarks[:, :2], self._idx, axis=0, out=self._lm_buf)
             
-            # Forward head posture
-            head_forward = avg_ear.x > avg_shoulder.x + 0.05
+            shoulder_slope, neck_angle, head_forward = _posture_from_xy(buf)
             
             return {
-                'shoulder_slope': shoulder_slope,
-                'neck_angle': neck_angle,
-                'head_forward': head_forward
+                'angles': np.array([shoulder_slope, neck_angle], dtype=np.float32),
+                'head_forward': bool(head_forward)
             }
         except:
             return None
     
+    def evaluate_posture(self, posture):
+        """Smooth the angles and alert if posture has stayed bad"""
+        # Exponential moving average of [shoulder_slope, neck_angle]
+        if self._ema is None:
+            self._ema = posture['angles']
+        else:
+            self._ema = (self.ema_alpha * posture['angles'] +
+                         (1 - self.ema_alpha) * self._ema)
+        
+        # [shoulder diff, neck diff]
+        diffs = np.abs(self._ema - self.good_posture_vec)
+        
+        logger.debug("Shoulder diff: %.1f° | Neck diff: %.1f° | Sensitivity: %d°",
+                     diffs[0], diffs[1], self.sensitivity)
+        
+        is_bad_posture = (bool((diffs > self.sensitivity).any()) or
+                          (posture['head_forward'] and
+                           not self.good_head_forward))
+        
+        if is_bad_posture:
+            self._bad_ticks += 1
+            logger.debug("Bad posture ticks: %d", self._bad_ticks)
+            if self._bad_ticks > 5:  # ~1 second including smoothing
+                self.show_alert()
+                self.update_status("⚠️ Poor posture detected!", "red")
+        else:
+            self._bad_ticks = 0
+            self.update_status("✓ Good posture! Keep it up 💚", "lightgreen")
+    
     def show_alert(self):
         """Show system-wide overlay alert"""
-        current_time = time.time()
+        current_time = time.monotonic()
         if current_time - self.last_alert_time < self.alert_duration:
             return
         
@@ -104,10 +213,7 @@ class PostureGuardian:
         
         # Create overlay window
         if self.alert_window:
-            try:
-                self.alert_window.destroy()
-            except:
-                pass
+            self._close_alert(self.alert_window)
         
         self.alert_window = tk.Toplevel()
         self.alert_window.title("Posture Alert")
@@ -155,107 +261,143 @@ class PostureGuardian:
         )
         message_label.pack(pady=10)
         
-        # Auto-close after duration
-        self.alert_window.after(int(self.alert_duration * 1000), 
-                               lambda: self.alert_window.destroy() if self.alert_window else None)
+        # Auto-close after duration; scheduled on root so the timer outlives
+        # the window if it is replaced early (and is cancelled then)
+        self._alert_job = self.root.after(int(self.alert_duration * 1000),
+                                          lambda win=self.alert_window: self._close_alert(win))
+    
+    def _close_alert(self, win):
+        """Close a specific alert window, forgetting it if it is the current one"""
+        try:
+            win.destroy()
+        except tk.TclError:
+            pass
+        if self.alert_window is win:
+            self.alert_window = None
+            if self._alert_job is not None:
+                self.root.after_cancel(self._alert_job)
+                self._alert_job = None
     
     def update_status(self, text, color='white'):
-        """Update status label"""
-        if self.status_label:
+        """Update status label (skipped if it already shows this text)"""
+        if self.status_label and (text, color) != self._status:
+            self._status = (text, color)
             self.status_label.config(text=text, fg=color)
     
     def calibrate_posture(self):
         """Calibrate good posture"""
         self.calibrating = True
-        self.good_posture = None
+        self.good_posture_vec = None
+        self._ema = None
+        self._bad_ticks = 0
         self.update_status("📸 Sit with good posture... capturing in 3 seconds!", "yellow")
         
         def finish_calibration():
             time.sleep(3)
             self.calibrating = False
-            if self.good_posture:
+            if self.good_posture_vec is not None:
                 self.update_status("✓ Good posture calibrated! Monitoring...", "lightgreen")
                 self.monitoring = True
         
         threading.Thread(target=finish_calibration, daemon=True).start()
     
-    def process_frame(self):
-        """Process camera frame and check posture"""
-        if not self.cap or not self.cap.isOpened():
-            return
-        
-        ret, frame = self.cap.read()
-        if not ret:
-            return
-        
-        # Flip frame horizontally for mirror view
-        frame = cv2.flip(frame, 1)
-        
-        # Convert to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Process with MediaPipe
-        results = self.pose.process(rgb_frame)
-        
-        # Draw landmarks
-        if results.pose_landmarks:
-            self.mp_drawing.draw_landmarks(
-                frame,
-                results.pose_landmarks,
-                self.mp_pose.POSE_CONNECTIONS
-            )
+    def capture_loop(self):
+        """Capture frames and run pose detection off the GUI thread"""
+        while not self._stop.is_set():
+            if not self.cap or not self.cap.isOpened():
+                return
+            
+            ret, frame = self.cap.read(self._cap_buf)
+            if not ret:
+                time.sleep(0.01)
+                continue
+            self._cap_buf = frame
+            if self._rgb_buf is None or self._rgb_buf.shape != frame.shape:
+                self._flip_buf = np.empty_like(frame)
+                self._rgb_buf = np.empty_like(frame)
             
-            # Check posture
-            posture = self.check_posture(results.pose_landmarks.landmark)
+            # Flip frame horizontally for mirror view
+            cv2.flip(frame, 1, dst=self._flip_buf)
+            
+            # Convert to RGB
+            rgb_frame = cv2.cvtColor(self._flip_buf, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+            
+            # Process with MediaPipe every Nth frame; posture changes slowly,
+            # so in between the last results are reused
+            if self._last_results is None or self._tick % self.infer_every == 0:
+                # Read-only lets MediaPipe use the buffer without copying
+                rgb_frame.flags.writeable = False
+                self._last_results = self.pose.process(rgb_frame)
+                rgb_frame.flags.writeable = True
+                
+                self._last_posture = None
+                if self._last_results.pose_landmarks:
+                    _landmarks_to_array(self._last_results.pose_landmarks, self._all_lm)
+                    self._last_posture = self.check_posture(self._all_lm)
+            self._tick += 1
+            results = self._last_results
+            posture = self._last_posture
+            detected = results.pose_landmarks is not None
             
+            # Draw skeleton
+            if detected and self.show_skeleton:
+                self.draw_skeleton(rgb_frame, self._all_lm)
+            
+            # Smaller video feed, resized into the PPM buffer; the GUI gets
+            # an immutable copy so this thread can keep reusing the buffer
+            cv2.resize(rgb_frame, (480, 360), dst=self._preview_buf)
+            ppm = bytes(self._ppm_buf)
+            
+            # Keep only the latest frame; drop the previous one if unread
+            try:
+                self._frame_q.get_nowait()
+            except queue.Empty:
+                pass
+            self._frame_q.put_nowait((ppm, detected, posture))
+    
+    def draw_skeleton(self, frame, landmarks):
+        """Draw the visible pose connections with a single polylines call"""
+        height, width = frame.shape[:2]
+        pts = (landmarks[:, :2] * (width, height)).astype(np.int32)
+        visible = landmarks[:, 2] > 0.5
+        conn = self._conn[visible[self._conn].all(axis=1)]
+        if len(conn):
+            cv2.polylines(frame, pts[conn], False, (224, 224, 224), 2)
+    
+    def process_frame(self):
+        """Show the latest processed frame and check posture"""
+        try:
+            ppm, detected, posture = self._frame_q.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            self.handle_frame(ppm, detected, posture)
+        
+        # Schedule next frame
+        if self.root and not self._stop.is_set():
+            self.root.after(16, self.process_frame)
+    
+    def handle_frame(self, ppm, detected, posture):
+        """Update posture state and display the frame"""
+        if detected:
             if posture:
                 # Calibration mode
-                if self.calibrating and not self.good_posture:
-                    self.good_posture = posture.copy()
+                if self.calibrating and self.good_posture_vec is None:
+                    self.good_posture_vec = posture['angles']
+                    self.good_head_forward = posture['head_forward']
                 
-                # Monitoring mode
-                elif self.monitoring and self.good_posture:
-                    shoulder_diff = abs(posture['shoulder_slope'] - 
-                                      self.good_posture['shoulder_slope'])
-                    neck_diff = abs(posture['neck_angle'] - 
-                                   self.good_posture['neck_angle'])
-                    
-                    # Debug: print values
-                    print(f"Shoulder diff: {shoulder_diff:.1f}° | Neck diff: {neck_diff:.1f}° | Sensitivity: {self.sensitivity}°")
-                    
-                    is_bad_posture = (shoulder_diff > self.sensitivity or 
-                                    neck_diff > self.sensitivity or
-                                    (posture['head_forward'] and 
-                                     not self.good_posture['head_forward']))
-                    
-                    if is_bad_posture:
-                        self.bad_posture_counter += 1
-                        print(f"Bad posture counter: {self.bad_posture_counter}")
-                        if self.bad_posture_counter > 5:  # ~1 second instead of 2
-                            self.show_alert()
-                            self.update_status("⚠️ Poor posture detected!", "red")
-                    else:
-                        self.bad_posture_counter = 0
-                        self.update_status("✓ Good posture! Keep it up 💚", "lightgreen")
+                # Monitoring mode (decide every eval_interval, not every frame)
+                elif self.monitoring and self.good_posture_vec is not None:
+                    now = time.monotonic()
+                    if now >= self._next_eval:
+                        self._next_eval = now + self.eval_interval
+                        self.evaluate_posture(posture)
         else:
             self.update_status("👤 No person detected", "white")
         
-        # Display frame
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame = cv2.resize(frame, (480, 360))  # Smaller video feed
-        
-        # Convert to PhotoImage
-        from PIL import Image, ImageTk
-        img = Image.fromarray(frame)
-        imgtk = ImageTk.PhotoImage(image=img)
-        
-        if self.video_label:
-            self.video_label.imgtk = imgtk
-            self.video_label.configure(image=imgtk)
-        
-        # Schedule next frame
-        if self.root:
-            self.root.after(33, self.process_frame)  # ~30 FPS
+        # Load into the shared PhotoImage; PPM is decoded natively by Tk
+        if self.video_image:
+            self.video_image.configure(data=ppm, format='PPM')
     
     def create_gui(self):
         """Create the main GUI window"""
@@ -279,7 +421,9 @@ class PostureGuardian:
         video_frame = tk.Frame(self.root, bg='black')
         video_frame.pack(pady=10)
         
-        self.video_label = tk.Label(video_frame, bg='black')
+        # One PhotoImage is reused for every frame instead of allocating a new one
+        self.video_image = tk.PhotoImage(width=480, height=360)
+        self.video_label = tk.Label(video_frame, bg='black', image=self.video_image)
         self.video_label.pack()
         
         # Status
@@ -425,8 +569,102 @@ class PostureGuardian:
             cursor='hand2'
         ).pack(side='left', padx=2)
         
+        # Detection rate controls
+        rate_frame = tk.Frame(settings_frame, bg='#667eea')
+        rate_frame.pack(fill='x', pady=8)
+        
+        tk.Label(
+            rate_frame,
+            text="Check Every:",
+            bg='#667eea',
+            fg='white',
+            font=('Helvetica', 11)
+        ).pack(side='left')
+        
+        self.rate_value = tk.Label(
+            rate_frame,
+            text="2 fr",
+            bg='#667eea',
+            fg='white',
+            font=('Helvetica', 11, 'bold'),
+            width=5
+        )
+        self.rate_value.pack(side='left', padx=10)
+        
+        rate_btn_frame = tk.Frame(rate_frame, bg='#667eea')
+        rate_btn_frame.pack(side='left')
+        
+        tk.Button(
+            rate_btn_frame,
+            text="-",
+            command=self.decrease_infer_every,
+            font=('Helvetica', 14, 'bold'),
+            bg='white',
+            fg='#667eea',
+            width=3,
+            cursor='hand2'
+        ).pack(side='left', padx=2)
+        
+        tk.Button(
+            rate_btn_frame,
+            text="+",
+            command=self.increase_infer_every,
+            font=('Helvetica', 14, 'bold'),
+            bg='white',
+            fg='#667eea',
+            width=3,
+            cursor='hand2'
+        ).pack(side='left', padx=2)
+        
+        tk.Label(
+            rate_frame,
+            text="(higher = less CPU)",
+            bg='#667eea',
+            fg='white',
+            font=('Helvetica', 9)
+        ).pack(side='left', padx=10)
+        
+        # Skeleton overlay toggle
+        self.skeleton_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(
+            settings_frame,
+            text="Show skeleton overlay",
+            variable=self.skeleton_var,
+            command=self.toggle_skeleton,
+            bg='#667eea',
+            fg='white',
+            selectcolor='#667eea',
+            activebackground='#667eea',
+            activeforeground='white',
+            font=('Helvetica', 11)
+        ).pack(anchor='w', pady=8)
+        
+        # Verbose logging toggle
+        self.verbose = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            settings_frame,
+            text="Verbose logging (print posture values)",
+            variable=self.verbose,
+            command=self.toggle_verbose,
+            bg='#667eea',
+            fg='white',
+            selectcolor='#667eea',
+            activebackground='#667eea',
+            activeforeground='white',
+            font=('Helvetica', 11)
+        ).pack(anchor='w', pady=8)
+        
         # Start camera
         self.cap = cv2.VideoCapture(0)
+        # Ask for compressed 640x480 frames and keep at most one frame queued,
+        # so we always analyze the newest frame
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        self.cap.set(cv2.CAP_PROP_FPS, 30)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._capture_thread = threading.Thread(target=self.capture_loop, daemon=True)
+        self._capture_thread.start()
         self.process_frame()
         
         # Handle window close
@@ -458,9 +696,32 @@ class PostureGuardian:
             self.alert_duration -= 1
             self.dur_value.config(text=f"{self.alert_duration}s")
     
+    def increase_infer_every(self):
+        """Check posture less often (uses less CPU)"""
+        if self.infer_every < 5:
+            self.infer_every += 1
+            self.rate_value.config(text=f"{self.infer_every} fr")
+    
+    def decrease_infer_every(self):
+        """Check posture more often (more responsive)"""
+        if self.infer_every > 1:
+            self.infer_every -= 1
+            self.rate_value.config(text=f"{self.infer_every} fr")
+    
+    def toggle_skeleton(self):
+        """Show or hide the skeleton drawn over the camera feed"""
+        self.show_skeleton = self.skeleton_var.get()
+    
+    def toggle_verbose(self):
+        """Show or hide per-frame posture debug output"""
+        logger.setLevel(logging.DEBUG if self.verbose.get() else logging.WARNING)
+    
     def on_closing(self):
         """Clean up on window close"""
         self.monitoring = False
+        self._stop.set()
+        if self._capture_thread:
+            self._capture_thread.join(timeout=1)
         if self.cap:
             self.cap.release()
         if self.root:
@@ -471,5 +732,6 @@ class PostureGuardian:
         self.create_gui()
 
 if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s")
     app = PostureGuardian()
     app.run()